@@ -14,17 +14,21 @@ Modes:
 
 import os
 import sys
-import time
+import stat
+import signal
+import threading
 import argparse
 import json
-from pathlib import Path
-from watchdog.observers import Observer
+import queue
+import logging
+import logging.handlers
+import concurrent.futures
 
 # Import from include directory
 try:
     from include.database_manager import DatabaseManager, MYSQL_AVAILABLE
     from include.sftp_manager import SFTPManager, SFTP_AVAILABLE
-    from include.file_change_handler import FileChangeHandler
+    from include.config_loader import load_config
 except ImportError as e:
     print(f"Error importing classes from include directory: {e}")
     print("Make sure all files in the include/ directory are present.")
@@ -58,7 +62,8 @@ def create_default_config(config_file):
             "password": "",
             "key_file": "",
             "port": 22,
-            "remote_path": "/remote/sync/path"
+            "remote_path": "/remote/sync/path",
+            "parallel_streams": 4
         },
         "database_settings": {
             "enabled": False,
@@ -66,7 +71,8 @@ def create_default_config(config_file):
             "user": "filemonitor",
             "password": "",
             "database": "file_activity",
-            "port": 3306
+            "port": 3306,
+            "pool_size": 10
         }
     }
     
@@ -80,8 +86,47 @@ def create_default_config(config_file):
         return False
 
 
+def _write_banner(lines):
+    """Write a block of lines to stdout with one encode pass and one write."""
+    text = "\n".join(lines) + "\n"
+    buffer = getattr(sys.stdout, 'buffer', None)
+    if buffer is None:
+        sys.stdout.write(text)
+        sys.stdout.flush()
+        return
+    
+    # Flush pending text output first so the banner keeps its place
+    sys.stdout.flush()
+    buffer.write(text.encode(sys.stdout.encoding or 'utf-8', 'replace'))
+    buffer.flush()
+
+
+def _start_event_logger():
+    """Route 'filemon' log records through a queue drained by a listener thread."""
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter('%(message)s'))
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    listener.start()
+    
+    logger = logging.getLogger('filemon')
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    return logger, listener
+
+
+def _teardown_manager(manager):
+    """Stop a manager's background worker and close its connection."""
+    if manager:
+        manager.stop_worker()
+        manager.disconnect()
+
+
 def run_monitor_mode(args, config):
     """Run the file monitoring service."""
+    abs_path = os.path.abspath(args.path)
+    
     # Initialize SFTP manager
     sftp_manager = None
     if not args.no_sync and SFTP_AVAILABLE:
@@ -101,7 +146,12 @@ def run_monitor_mode(args, config):
                 password=sftp_pass,
                 key_file=sftp_key,
                 port=sftp_port,
-                remote_path=sftp_path
+                remote_path=sftp_path,
+                channels=sftp_config.get('parallel_streams', 4),
+                compress=sftp_config.get('compress', True),
+                skip_unchanged=sftp_config.get('skip_unchanged', False),
+                backend=sftp_config.get('backend', 'auto'),
+                max_queued=sftp_config.get('max_queued', 10000)
             )
             
             if sftp_manager.connect():
@@ -129,10 +179,16 @@ def run_monitor_mode(args, config):
                 user=db_user,
                 password=db_pass,
                 database=db_name,
-                port=db_port
+                port=db_port,
+                batch_size=db_config.get('batch_size', 500),
+                flush_interval_ms=db_config.get('flush_interval_ms', 50),
+                pool_size=db_config.get('pool_size', 10),
+                max_queued=db_config.get('max_queued', 50000),
+                compress=db_config.get('compress', True),
+                path_index=db_config.get('path_index', True)
             )
             
-            if db_manager.connect():
+            if db_manager.connect() and db_manager.health_check():
                 db_manager.start_worker()
             else:
                 print("Warning: Database connection failed, continuing without logging")
@@ -140,63 +196,89 @@ def run_monitor_mode(args, config):
         else:
             print("Warning: Database not configured for HOST mode")
     
+    # Imported here so the version commands never load watchdog
+    from include.file_change_handler import FileChangeHandler
+    from include.inotify_observer import InotifyObserver, INOTIFY_AVAILABLE
+    
+    # Event output goes through a queue so the observer thread never blocks on stdout
+    logger, listener = _start_event_logger()
+    
     # Create event handler and observer
     event_handler = FileChangeHandler(
         ignore_patterns=args.ignore if args.ignore else None,
         ignore_config_file=args.config,
+        ignore_folders=config['ignore_folders'],
+        ignore_files=config['ignore_files'],
         sftp_manager=sftp_manager,
         db_manager=db_manager,
-        local_base_path=os.path.abspath(args.path),
-        mode=args.mode
+        local_base_path=abs_path,
+        mode=args.mode,
+        remote_base=sftp_manager.remote_path if sftp_manager else None,
+        logger=logger
     )
-    observer = Observer()
     
-    # Schedule the observer
-    observer.schedule(
-        event_handler,
-        args.path,
-        recursive=args.recursive
-    )
+    ignore_folders = config['ignore_folders']
+    
+    # Native inotify on Linux, watchdog everywhere else
+    if INOTIFY_AVAILABLE:
+        observer = InotifyObserver(ignore_dirs=ignore_folders)
+    else:
+        from watchdog.observers import Observer
+        observer = Observer()
+    
+    # InotifyObserver prunes ignored folders while walking; watchdog's single
+    # recursive watch reports them and the handler's should_ignore drops them
+    observer.schedule(event_handler, abs_path, recursive=args.recursive)
     
     if not args.quiet:
-        print(f"Starting file monitor for: {os.path.abspath(args.path)}")
-        print(f"Mode: {args.mode}")
-        print(f"Ignoring patterns: {event_handler.ignore_patterns}")
-        print(f"Recursive monitoring: {args.recursive}")
-        print("Monitoring ALL files (text detection preserved for future use)")
+        lines = [
+            f"Starting file monitor for: {abs_path}",
+            f"Mode: {args.mode}",
+            f"Ignoring patterns: {event_handler.ignore_patterns}",
+            f"Recursive monitoring: {args.recursive}",
+            "Monitoring ALL files (text detection preserved for future use)"
+        ]
         
         if sftp_manager and sftp_manager.connected:
-            print(f"✅ SFTP sync enabled: {sftp_manager.username}@{sftp_manager.host}:{sftp_manager.remote_path}")
+            lines.append(f"✅ SFTP sync enabled: {sftp_manager.username}@{sftp_manager.host}:{sftp_manager.remote_path}")
         else:
-            print("❌ SFTP sync disabled")
+            lines.append("❌ SFTP sync disabled")
         
         if db_manager and db_manager.connected:
-            print(f"✅ Database logging enabled: {db_manager.user}@{db_manager.host}:{db_manager.port}/{db_manager.database}")
+            lines.append(f"✅ Database logging enabled: {db_manager.user}@{db_manager.host}:{db_manager.port}/{db_manager.database}")
         else:
-            print("❌ Database logging disabled")
+            lines.append("❌ Database logging disabled")
         
-        print("Press Ctrl+C to stop monitoring...")
-        print("-" * 50)
+        lines.append("Press Ctrl+C to stop monitoring...")
+        lines.append("-" * 50)
+        _write_banner(lines)
     
-    try:
-        observer.start()
-        while True:
-            time.sleep(1)
-    except KeyboardInterrupt:
-        if not args.quiet:
-            print("\nStopping file monitor...")
-        
-        observer.stop()
-        
-        if sftp_manager:
-            sftp_manager.stop_worker()
-            sftp_manager.disconnect()
-        
-        if db_manager:
-            db_manager.stop_worker()
-            db_manager.disconnect()
+    # Block on an event instead of polling; SIGINT/SIGTERM wake it immediately
+    stop_event = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    
+    observer.start()
+    stop_event.wait()
     
-    observer.join()
+    if not args.quiet:
+        print("\nStopping file monitor...")
+    
+    observer.stop()
+    
+    # Independent teardowns overlap, so shutdown takes the slowest rather than the sum
+    with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [
+            executor.submit(_teardown_manager, sftp_manager),
+            executor.submit(_teardown_manager, db_manager),
+            executor.submit(observer.join)
+        ]
+        concurrent.futures.wait(futures)
+        for future in futures:
+            future.result()
+    
+    # The observer and the draining SFTP workers have logged their last lines
+    listener.stop()
 
 
 def run_version_mode(args, config):
@@ -221,7 +303,8 @@ def run_version_mode(args, config):
         user=db_user,
         password=db_pass,
         database=db_name,
-        port=db_port
+        port=db_port,
+        pool_size=2  # One query at a time; the pool opens every connection up front
     )
     
     if not db.connect():
@@ -232,15 +315,25 @@ def run_version_mode(args, config):
         if args.version_command == 'list':
             versions = db.get_file_versions(args.file_path, args.limit)
             if versions:
-                print(f"\n📋 Versions for: {args.file_path}")
-                print("-" * 80)
-                print(f"{'ID':<6} {'Timestamp':<20} {'Size':<10} {'Checksum':<16}")
-                print("-" * 80)
-                for version in versions:
-                    timestamp = version['version_timestamp'].strftime('%Y-%m-%d %H:%M:%S')
-                    size_kb = f"{version['file_size'] / 1024:.1f} KB"
-                    checksum_short = version['checksum'][:16] if version['checksum'] else 'N/A'
-                    print(f"{version['id']:<6} {timestamp:<20} {size_kb:<10} {checksum_short:<16}")
+                lines = [
+                    f"\n📋 Versions for: {args.file_path}",
+                    "-" * 80,
+                    f"{'ID':<6} {'Timestamp':<20} {'Size':<10} {'Checksum':<16}",
+                    "-" * 80
+                ]
+                # Timestamps are always 19 characters, so pad the column by hand
+                row_format = "{:<6} {:%Y-%m-%d %H:%M:%S}  {:<10} {:<16}"
+                lines.extend(
+                    row_format.format(
+                        version['id'],
+                        version['version_timestamp'],
+                        f"{version['file_size'] / 1024:.1f} KB",
+                        version['checksum'][:16] if version['checksum'] else 'N/A'
+                    )
+                    for version in versions
+                )
+                # One write for the whole table instead of one per row
+                sys.stdout.write("\n".join(lines) + "\n")
             else:
                 print(f"❌ No versions found for: {args.file_path}")
         
@@ -259,8 +352,8 @@ def run_version_mode(args, config):
         db.disconnect()
 
 
-def main():
-    """Main function for the unified file service."""
+def _build_parser():
+    """Build the command line parser and the version subcommand parser."""
     parser = argparse.ArgumentParser(
         description="Unified File Service - Monitor files and manage versions",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -327,7 +420,7 @@ Examples:
     )
     
     # Subcommands
-    subparsers = parser.add_subparsers(dest='mode', help='Service mode')
+    subparsers = parser.add_subparsers(dest='service', help='Service mode')
     
     # Monitor mode
     monitor_parser = subparsers.add_parser('monitor', help='Monitor files for changes')
@@ -420,47 +513,62 @@ Examples:
     search_parser.add_argument('pattern', help='File path pattern to search')
     search_parser.add_argument('--limit', type=int, default=20, help='Number of results to show')
     
-    args = parser.parse_args()
+    return parser, version_parser
+
+
+# Built once at import time and reused by every main() call
+_PARSER, _VERSION_PARSER = _build_parser()
+
+
+def main():
+    """Main function for the unified file service."""
+    args = _PARSER.parse_args()
     
-    # Handle config creation
+    # Handle config creation before anything reads the config
     if args.create_config:
         config_file = args.config or 'config.json'
-        if create_default_config(config_file):
-            print(f"Default configuration created: {config_file}")
-            print("Edit this file to customize ignore patterns, SFTP settings, and database settings.")
-        sys.exit(0)
+        if not create_default_config(config_file):
+            sys.exit(1)
+        print(f"Default configuration created: {config_file}")
+        print("Edit this file to customize ignore patterns, SFTP settings, and database settings.")
+        return
     
     # Load configuration
     config = {}
-    if args.config and os.path.exists(args.config):
+    if args.config:
         try:
-            with open(args.config, 'r') as f:
-                config = json.load(f)
+            config = dict(load_config(args.config))
         except (json.JSONDecodeError, IOError):
             pass
     
+    # Hashable sets for the per-event membership tests
+    config['ignore_folders'] = frozenset(config.get('ignore_folders', ()))
+    config['ignore_files'] = frozenset(config.get('ignore_files', ()))
+    
     # Run appropriate mode
-    if args.mode == 'monitor':
-        # Validate the path
-        if not os.path.exists(args.path):
+    if args.service == 'monitor':
+        # Validate the path with a single stat call
+        try:
+            path_stat = os.stat(args.path)
+        except OSError:
             print(f"Error: Path '{args.path}' does not exist.", file=sys.stderr)
             sys.exit(1)
         
-        if not os.path.isdir(args.path):
+        if not stat.S_ISDIR(path_stat.st_mode):
             print(f"Error: Path '{args.path}' is not a directory.", file=sys.stderr)
             sys.exit(1)
         
         run_monitor_mode(args, config)
     
-    elif args.mode == 'version':
+    elif args.service == 'version':
         if not args.version_command:
-            version_parser.print_help()
+            _VERSION_PARSER.print_help()
             return
         
         run_version_mode(args, config)
     
     else:
-        parser.print_help()
+        _PARSER.print_help()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Batched Queue for File Monitor Service
+
+Producer/consumer hand-off that moves items in chunks instead of taking the
+consumer lock and waking the worker for every single event.
+"""
+
+import time
+import queue
+import threading
+from collections import deque
+
+
+class BatchedQueue:
+    """Queue that buffers producer puts and hands them to consumers in chunks.
+
+    Producers append to a small pending list guarded by its own lock. The list
+    is moved to the consumer side once it holds flush_size items, or by a
+    flusher thread flush_ms after the first item arrived. Consumers can drain
+    many items under a single lock acquisition with get_batch().
+    """
+
+    def __init__(self, flush_size=64, flush_ms=5):
+        self.flush_size = max(1, int(flush_size))
+        self.flush_interval = flush_ms / 1000.0
+
+        # Consumer side
+        self._items = deque()
+        self._not_empty = threading.Condition()
+
+        # Producer side
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._pending_event = threading.Event()
+        self._flusher = None
+
+    def put(self, item):
+        """Buffer an item; it reaches consumers on the next flush."""
+        with self._pending_lock:
+            self._pending.append(item)
+            count = len(self._pending)
+
+        if count >= self.flush_size:
+            self.flush()
+        elif count == 1:
+            self._start_flusher()
+            self._pending_event.set()
+
+    def put_batch(self, items):
+        """Hand a list of items straight to consumers with one lock acquisition."""
+        if not items:
+            return
+        with self._not_empty:
+            self._items.extend(items)
+            self._not_empty.notify_all()
+
+    def flush(self):
+        """Move buffered producer items to the consumer side."""
+        with self._pending_lock:
+            items, self._pending = self._pending, []
+        self.put_batch(items)
+
+    def _start_flusher(self):
+        """Start the flusher thread on first use."""
+        if self._flusher is None:
+            with self._pending_lock:
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+                    self._flusher.start()
+
+    def _flush_loop(self):
+        """Flush pending items shortly after they arrive; idle otherwise."""
+        while True:
+            self._pending_event.wait()
+            self._pending_event.clear()
+            # Give the rest of a burst time to accumulate
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def get(self, block=True, timeout=None):
+        """Remove and return one item, raising queue.Empty like queue.Queue."""
+        return self.get_batch(1, block=block, timeout=timeout)[0]
+
+    def get_nowait(self):
+        """Remove and return one item without blocking."""
+        return self.get(block=False)
+
+    def get_batch(self, max_items=None, block=True, timeout=None):
+        """Remove and return up to max_items items (all if None) under one lock."""
+        with self._not_empty:
+            if block:
+                if not self._not_empty.wait_for(lambda: self._items, timeout):
+                    raise queue.Empty
+            elif not self._items:
+                raise queue.Empty
+
+            if max_items is None or max_items >= len(self._items):
+                batch = list(self._items)
+                self._items.clear()
+            else:
+                batch = [self._items.popleft() for _ in range(max_items)]
+            return batch
+
+    def qsize(self):
+        """Approximate number of queued items, including unflushed ones."""
+        return len(self._items) + len(self._pending)
+
+    def empty(self):
+        """Return True if no items are queued."""
+        return self.qsize() == 0
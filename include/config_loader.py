@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Config Loader for File Monitor Service
+
+Parses the JSON configuration file once per process and shares the result
+between the service entry point and the file change handler.
+"""
+
+import json
+import functools
+from pathlib import Path
+
+# Optional fast JSON parser
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+@functools.lru_cache(maxsize=1)
+def load_config(config_file):
+    """Load a JSON config file, returning the cached dict on repeated calls.
+    
+    Raises json.JSONDecodeError (orjson's error subclasses it) or IOError.
+    """
+    data = Path(config_file).read_bytes()
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -8,16 +8,23 @@ Manages MySQL database operations for file activity logging.
 import os
 import sys
 import json
+import time
 import threading
 import queue
 import hashlib
-from pathlib import Path
+import functools
+import itertools
+import contextlib
+import concurrent.futures
 from datetime import datetime
 
+from .batched_queue import BatchedQueue
+from .path_utils import file_suffix
+
 # MySQL imports
 try:
     import mysql.connector
-    from mysql.connector import Error
+    from mysql.connector import Error, pooling
     MYSQL_AVAILABLE = True
 except ImportError:
     MYSQL_AVAILABLE = False
@@ -25,34 +32,119 @@ except ImportError:
     print("Install with: sudo apt install python3-mysql.connector")
 
 
+# (second, datetime) shared by every row stamped within that second
+_clock = (None, None)
+
+
+def _now():
+    """Return datetime.now() at the DATETIME columns' one-second resolution.
+    
+    All rows stamped within the same second share one datetime object instead
+    of building a new one each.
+    """
+    global _clock
+    second = int(time.time())
+    cached_second, cached = _clock
+    if second != cached_second:
+        cached = datetime.fromtimestamp(second)
+        _clock = (second, cached)
+    return cached
+
+
+@functools.lru_cache(maxsize=128)
+def _multi_row_insert(insert, rows):
+    """Extend a single-row INSERT ... VALUES (...) to rows rows, built once per size.
+    
+    The cache also hands back the same string object for a size, which is what
+    lets a prepared cursor skip re-preparing it.
+    """
+    head, values = insert.rstrip().rsplit('VALUES', 1)
+    return f"{head}VALUES {', '.join([values.strip()] * rows)}"
+
+
 class DatabaseManager:
     """Manages MySQL database operations for file activity logging."""
     
-    def __init__(self, host, user, password, database, port=3306):
+    ACTIVITY_INSERT = """
+    INSERT INTO file_activity 
+    (timestamp, event_type, file_path, old_path, new_path, file_size, is_text_file, file_extension, sync_status)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+    """
+    
+    # Rows per fixed-width multi-row insert, prepared once per worker connection
+    ACTIVITY_CHUNK = 50
+    
+    VERSION_INSERT = """
+    INSERT INTO file_versions 
+    (file_path, version_timestamp, file_content, file_size, checksum)
+    VALUES (%s, %s, %s, %s, %s)
+    """
+    
+    # Versions per multi-row insert, capped by content size to stay under max_allowed_packet
+    VERSION_CHUNK = 16
+    VERSION_BATCH_BYTES = 16 * 1024 * 1024
+    
+    # mysql-connector refuses pools larger than this (pooling.CNX_POOL_MAXSIZE)
+    MAX_POOL_SIZE = 32
+    
+    def __init__(self, host, user, password, database, port=3306, batch_size=500, flush_interval_ms=50,
+                 pool_size=10, max_queued=50000, compress=True, path_index=True):
         self.host = host
         self.user = user
         self.password = password
         self.database = database
         self.port = port
-        self.connection = None
+        self.compress = compress
+        self.path_index = path_index
         self.connected = False
-        self.operation_queue = queue.Queue()
-        self.worker_thread = None
+        self.pool = None
+        
+        # Workers share the pool, leaving headroom for direct calls
+        self.pool_size = max(2, int(pool_size))
+        if self.pool_size > self.MAX_POOL_SIZE:
+            print(f"⚠️  pool_size {self.pool_size} exceeds {self.MAX_POOL_SIZE}, using {self.MAX_POOL_SIZE}")
+            self.pool_size = self.MAX_POOL_SIZE
+        self.workers = max(1, self.pool_size - 2)
+        self.operation_queues = [BatchedQueue() for _ in range(self.workers)]
+        self.worker_threads = []
+        self.reader_pool = None
+        self._local = threading.local()
+        self._connect_lock = threading.Lock()
+        
+        # Past max_queued operations per worker, everything waits in an ordered
+        # overflow where logs and version saves coalesce to the latest one per key
+        self.max_queued = max(1, int(max_queued))
+        self._overflow = [{} for _ in range(self.workers)]
+        self._overflow_keys = [{} for _ in range(self.workers)]
+        self._overflow_lock = threading.Lock()
+        self._overflow_seq = itertools.count()
+        
+        # Worker drains up to batch_size operations or flush_interval_ms per flush
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval_ms / 1000.0
         
     def connect(self):
-        """Establish MySQL connection and create tables if needed."""
+        """Establish the MySQL connection pool and create tables if needed."""
         try:
-            self.connection = mysql.connector.connect(
+            # Pooled sessions let the workers reuse authenticated connections
+            self.pool = pooling.MySQLConnectionPool(
+                pool_name=f"filehub_{id(self)}",
+                pool_size=self.pool_size,
                 host=self.host,
                 user=self.user,
                 password=self.password,
                 database=self.database,
                 port=self.port,
-                autocommit=True
+                autocommit=True,
+                charset='utf8mb4',
+                # C extension when it is importable; compression shrinks version payloads
+                use_pure=not mysql.connector.HAVE_CEXT,
+                compress=self.compress
             )
+            with self._connection() as connection:
+                self.connected = connection.is_connected()
             
-            if self.connection.is_connected():
-                self.connected = True
+            if self.connected:
                 print(f"✅ Connected to MySQL database: {self.user}@{self.host}:{self.port}/{self.database}")
                 self.create_tables()
                 return True
@@ -63,19 +155,66 @@ class DatabaseManager:
             return False
     
     def disconnect(self):
-        """Close MySQL connection."""
-        if self.connection and self.connection.is_connected():
-            self.connection.close()
+        """Close MySQL connections."""
+        if self.pool:
+            # Check out every idle connection and close its socket; close() on a
+            # pooled connection would only hand it back
+            while True:
+                try:
+                    connection = self.pool.get_connection()
+                except Error:  # PoolError once the pool is empty
+                    break
+                connection.disconnect()
+            self.pool = None
         self.connected = False
         print("🔌 MySQL connection closed")
     
+    def health_check(self):
+        """Run SELECT 1 on the connection; True if the server answered."""
+        try:
+            with self._connection() as connection, connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+            return True
+        except Error as e:
+            print(f"❌ Database health check failed: {e}")
+            return False
+    
+    @contextlib.contextmanager
+    def _connection(self):
+        """Yield the calling worker's flush connection, or borrow one from the pool."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            yield connection
+            return
+        
+        connection = self.pool.get_connection()
+        try:
+            yield connection
+        finally:
+            connection.close()  # Returns it to the pool
+    
+    @contextlib.contextmanager
+    def _prepared(self, connection, sql):
+        """Yield a prepared cursor for sql; a worker keeps it for the life of its connection."""
+        statements = getattr(self._local, 'statements', None)
+        if statements is None or connection is not self._local.connection:
+            with connection.cursor(prepared=True) as cursor:
+                yield cursor
+            return
+        
+        if sql not in statements:
+            statements[sql] = connection.cursor(prepared=True)
+        yield statements[sql]
+    
     def create_tables(self):
         """Create necessary tables if they don't exist."""
         try:
-            cursor = self.connection.cursor()
+            # The file_path index only serves path-based sync updates; it can be skipped
+            path_index = "INDEX idx_file_path (file_path(255))," if self.path_index else ""
             
             # File activity table
-            create_table_query = """
+            create_table_query = f"""
             CREATE TABLE IF NOT EXISTS file_activity (
                 id INT AUTO_INCREMENT PRIMARY KEY,
                 timestamp DATETIME NOT NULL,
@@ -91,7 +230,7 @@ class DatabaseManager:
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 INDEX idx_timestamp (timestamp),
                 INDEX idx_event_type (event_type),
-                INDEX idx_file_path (file_path(255)),
+                {path_index}
                 INDEX idx_sync_status (sync_status)
             ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
             """
@@ -112,52 +251,111 @@ class DatabaseManager:
             ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
             """
             
-            cursor.execute(create_table_query)
-            cursor.execute(create_versions_query)
+            queries = (create_table_query, create_versions_query)
+            with self._connection() as connection, connection.cursor() as cursor:
+                # Both DDLs in one round-trip where the connector still supports it
+                try:
+                    results = cursor.execute(";".join(queries), multi=True)
+                except TypeError:
+                    # Connector 9.2+ dropped multi=; send them one at a time
+                    for query in queries:
+                        cursor.execute(query)
+                else:
+                    for _ in results:  # Each statement runs as the generator advances
+                        pass
             print("✅ Database tables created/verified")
             
         except Error as e:
             print(f"❌ Error creating tables: {e}")
     
+    def _activity_row(self, event_type, file_path, old_path=None, new_path=None,
+                      file_size=None, is_text_file=None, sync_status='PENDING'):
+        """Build the parameter tuple for one file_activity row."""
+        # Get file extension
+        file_extension = file_suffix(file_path) if file_path else None
+        
+        return (
+            _now(),
+            event_type,
+            file_path,
+            old_path,
+            new_path,
+            file_size,
+            is_text_file,
+            file_extension,
+            sync_status
+        )
+    
     def log_activity(self, event_type, file_path, old_path=None, new_path=None, 
                     file_size=None, is_text_file=None, sync_status='PENDING'):
         """Log file activity to database."""
+        return self.log_activities([(event_type, file_path, old_path, new_path,
+                                     file_size, is_text_file, sync_status)])
+    
+    def log_activities(self, activities):
+        """Log a batch of file activities with a single executemany round-trip."""
+        return self._insert_activity_rows([self._activity_row(*activity) for activity in activities])
+    
+    def _insert_activity_rows(self, rows):
+        """Insert prebuilt file_activity parameter tuples."""
         try:
-            cursor = self.connection.cursor()
-            
-            # Get file extension
-            file_extension = Path(file_path).suffix if file_path else None
-            
-            # Prepare query
-            query = """
-            INSERT INTO file_activity 
-            (timestamp, event_type, file_path, old_path, new_path, file_size, is_text_file, file_extension, sync_status)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
+            chunk = self.ACTIVITY_CHUNK
+            full = len(rows) - len(rows) % chunk
+            failed = []
             
-            values = (
-                datetime.now(),
-                event_type,
-                file_path,
-                old_path,
-                new_path,
-                file_size,
-                is_text_file,
-                file_extension,
-                sync_status
-            )
+            with self._connection() as connection:
+                # Whole chunks reuse the prepared statement, skipping the server-side parse
+                if full:
+                    sql = _multi_row_insert(self.ACTIVITY_INSERT, chunk)
+                    with self._prepared(connection, sql) as cursor:
+                        for start in range(0, full, chunk):
+                            part = rows[start:start + chunk]
+                            try:
+                                cursor.execute(sql, tuple(itertools.chain.from_iterable(part)))
+                            except Error as e:
+                                failed.extend(self._insert_activity_rows_singly(connection, part, e))
+                
+                # The remainder goes out in one round-trip using the cached template for its size
+                rest = rows[full:]
+                if rest:
+                    try:
+                        with connection.cursor() as cursor:
+                            cursor.execute(_multi_row_insert(self.ACTIVITY_INSERT, len(rest)),
+                                           tuple(itertools.chain.from_iterable(rest)))
+                    except Error as e:
+                        failed.extend(self._insert_activity_rows_singly(connection, rest, e))
             
-            cursor.execute(query, values)
-            print(f"📊 Logged: {event_type} - {file_path}")
+            # Identity, not equality: a repeated event yields equal but separate rows
+            failed_ids = {id(row) for row in failed}
+            for row in rows:
+                if id(row) not in failed_ids:
+                    print(f"📊 Logged: {row[1]} - {row[2]}")
+            return not failed
             
         except Error as e:
             print(f"❌ Database logging failed: {e}")
+            return False
+    
+    def _insert_activity_rows_singly(self, connection, rows, error):
+        """Retry a failed multi-row insert one row at a time.
+        
+        One bad row fails the whole statement, so this keeps the rest of the
+        chunk. Returns the rows that still failed.
+        """
+        print(f"⚠️  Batch logging failed ({error}), retrying {len(rows)} rows individually")
+        failed = []
+        with connection.cursor() as cursor:
+            for row in rows:
+                try:
+                    cursor.execute(self.ACTIVITY_INSERT, row)
+                except Error as e:
+                    print(f"❌ Database logging failed for {row[1]} - {row[2]}: {e}")
+                    failed.append(row)
+        return failed
     
     def update_sync_status(self, file_path, sync_status, event_type=None):
         """Update sync status for a file."""
         try:
-            cursor = self.connection.cursor()
-            
             if event_type:
                 query = """
                 UPDATE file_activity 
@@ -165,7 +363,7 @@ class DatabaseManager:
                 WHERE file_path = %s AND event_type = %s
                 ORDER BY timestamp DESC LIMIT 1
                 """
-                values = (sync_status, datetime.now(), file_path, event_type)
+                values = (sync_status, _now(), file_path, event_type)
             else:
                 query = """
                 UPDATE file_activity 
@@ -173,87 +371,232 @@ class DatabaseManager:
                 WHERE file_path = %s
                 ORDER BY timestamp DESC LIMIT 1
                 """
-                values = (sync_status, datetime.now(), file_path)
+                values = (sync_status, _now(), file_path)
             
-            cursor.execute(query, values)
+            with self._connection() as connection, connection.cursor() as cursor:
+                cursor.execute(query, values)
             
         except Error as e:
             print(f"❌ Database update failed: {e}")
     
     def start_worker(self):
-        """Start background worker thread for database operations."""
-        if not self.worker_thread or not self.worker_thread.is_alive():
-            self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
-            self.worker_thread.start()
+        """Start background worker threads for database operations."""
+        self.worker_threads = [t for t in self.worker_threads if t.is_alive()]
+        if not self.worker_threads:
+            # Version content is read here so large files never stall the inserting workers
+            self.reader_pool = concurrent.futures.ThreadPoolExecutor(
+                max_workers=4, thread_name_prefix='filehub-version-reader')
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._worker_loop, args=(index,), daemon=True)
+                thread.start()
+                self.worker_threads.append(thread)
+    
+    def _next_batch(self, operation_queue):
+        """Block for one operation, then gather more until the batch is full or the flush interval ends."""
+        batch = operation_queue.get_batch(self.batch_size, timeout=1)
+        deadline = time.monotonic() + self.flush_interval
+        
+        while len(batch) < self.batch_size and None not in batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.extend(operation_queue.get_batch(
+                    self.batch_size - len(batch), block=remaining > 0, timeout=max(remaining, 0)))
+            except queue.Empty:
+                break
+        return batch
+    
+    def _read_versions(self, batch):
+        """Turn version saves that skipped the reader pool into rows before any transaction opens."""
+        return [
+            ('version', self._version_row(*args)) if op_type == 'save_version' else (op_type, args)
+            for op_type, args in batch
+        ]
+    
+    def _process_batch(self, batch):
+        """Run a batch of operations, coalescing consecutive log operations."""
+        pending_logs = []
+        versions = []
+        
+        for op_type, args in batch:
+            if op_type == 'log':
+                pending_logs.append(args)  # Row tuple built by queue_operation
+                continue
+            if op_type == 'version':
+                if args:
+                    versions.append(args)  # Row tuple built by _read_versions
+                continue
+            
+            # Flush earlier logs first so later operations see their rows
+            if pending_logs:
+                self._insert_activity_rows(pending_logs)
+                pending_logs = []
+            
+            if op_type == 'update_sync':
+                self.update_sync_status(*args)
+        
+        if pending_logs:
+            self._insert_activity_rows(pending_logs)
+        if versions:
+            self._insert_version_rows(versions)
+    
+    def _worker_connection(self):
+        """Return the worker's pooled connection, replacing it if it dropped.
+        
+        Workers hold their connection between flushes because returning it to
+        the pool resets the session, which drops its prepared statements.
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or not connection.is_connected():
+            self._release_worker_connection()
+            connection = self._local.connection = self.pool.get_connection()
+            self._local.statements = {}
+        return connection
+    
+    def _release_worker_connection(self):
+        """Return the worker's connection to the pool."""
+        connection = getattr(self._local, 'connection', None)
+        self._local.connection = None
+        self._local.statements = None
+        if connection is not None:
+            try:
+                connection.close()
+            except Error:
+                pass
+    
+    def _flush(self, batch):
+        """Process a batch on the worker's connection.
+        
+        Multi-operation batches run in one transaction so the server commits
+        once per flush; a lone operation keeps the autocommit path.
+        """
+        # Disk reads happen here so they never hold a transaction open
+        batch = self._read_versions(batch)
+        
+        connection = self._worker_connection()
+        if len(batch) == 1:
+            self._process_batch(batch)
+            return
+        
+        connection.start_transaction()
+        try:
+            self._process_batch(batch)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
     
-    def _worker_loop(self):
+    def _worker_loop(self, index):
         """Background worker loop for processing database operations."""
+        operation_queue = self.operation_queues[index]
+        
         while True:
             try:
-                operation = self.operation_queue.get(timeout=1)
-                if operation is None:  # Shutdown signal
-                    break
+                try:
+                    batch = self._next_batch(operation_queue)
+                except queue.Empty:
+                    batch = []
                 
-                op_type, args = operation
+                shutdown = None in batch
+                if shutdown:  # Shutdown signal, finish what came before it
+                    batch = batch[:batch.index(None)]
                 
-                if not self.connected:
-                    print("⚠️  Database not connected, attempting to reconnect...")
-                    if not self.connect():
-                        print("❌ Reconnection failed, skipping operation")
-                        continue
+                # Held operations are newer than anything still in the queue
+                if shutdown or operation_queue.qsize() == 0:
+                    batch.extend(self._drain_overflow(index))
                 
-                if op_type == 'log':
-                    self.log_activity(*args)
-                elif op_type == 'update_sync':
-                    self.update_sync_status(*args)
-                elif op_type == 'save_version':
-                    self.save_file_version(*args)
+                if batch:
+                    if not self.connected:
+                        print("⚠️  Database not connected, attempting to reconnect...")
+                        with self._connect_lock:
+                            reconnected = self.connected or self.connect()
+                        if not reconnected:
+                            print("❌ Reconnection failed, skipping operations")
+                            batch = []
+                    
+                    if batch:
+                        self._flush(batch)
                 
-                self.operation_queue.task_done()
+                if shutdown:
+                    break
                 
-            except queue.Empty:
-                continue
             except Exception as e:
                 print(f"❌ Database worker error: {e}")
+        
+        self._release_worker_connection()
     
-    def save_file_version(self, file_path, file_content=None):
-        """Save a version of a text file to the database."""
+    def _read_file_bytes(self, file_path):
+        """Read a text file for versioning as UTF-8 bytes, or None if it cannot be read."""
+        try:
+            with open(file_path, 'rb') as f:
+                data = f.read()
+        except (IOError, OSError):
+            return None
+        
+        # Valid UTF-8 is stored as read; only invalid files pay for a decode/encode pass
+        if not data.isascii():
+            try:
+                data.decode('utf-8')
+            except UnicodeDecodeError:
+                data = data.decode('utf-8', errors='ignore').encode('utf-8')
+        return data
+    
+    def _version_row(self, file_path, file_content=None):
+        """Build the parameter tuple for one file_versions row, or None without content."""
+        if file_content:
+            data = file_content.encode('utf-8')
+        else:
+            data = self._read_file_bytes(file_path)
+        if not data:
+            return None
+        
+        # Size, checksum and the stored content share one bytes object
+        return (
+            file_path,
+            _now(),
+            data,
+            len(data),
+            hashlib.sha256(data).hexdigest()
+        )
+    
+    def _version_groups(self, rows):
+        """Split version rows into groups bounded by count and content size."""
+        group, group_bytes = [], 0
+        for row in rows:
+            if group and (len(group) == self.VERSION_CHUNK or group_bytes + row[3] > self.VERSION_BATCH_BYTES):
+                yield group
+                group, group_bytes = [], 0
+            group.append(row)
+            group_bytes += row[3]
+        if group:
+            yield group
+    
+    def _insert_version_rows(self, rows):
+        """Insert prebuilt file_versions rows, several per prepared statement."""
         try:
-            if not file_content and os.path.exists(file_path):
-                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    file_content = f.read()
+            with self._connection() as connection:
+                # Binary protocol sends the content bytes as-is instead of escaping them
+                for group in self._version_groups(rows):
+                    sql = _multi_row_insert(self.VERSION_INSERT, len(group))
+                    with self._prepared(connection, sql) as cursor:
+                        cursor.execute(sql, tuple(itertools.chain.from_iterable(group)))
+            
+            for row in rows:
+                print(f"💾 Version saved: {row[0]} ({row[3]} bytes)")
+            return True
             
-            if file_content:
-                file_size = len(file_content.encode('utf-8'))
-                checksum = hashlib.sha256(file_content.encode('utf-8')).hexdigest()
-                
-                cursor = self.connection.cursor()
-                query = """
-                INSERT INTO file_versions 
-                (file_path, version_timestamp, file_content, file_size, checksum)
-                VALUES (%s, %s, %s, %s, %s)
-                """
-                
-                values = (
-                    file_path,
-                    datetime.now(),
-                    file_content,
-                    file_size,
-                    checksum
-                )
-                
-                cursor.execute(query, values)
-                print(f"💾 Version saved: {file_path} ({file_size} bytes)")
-                return True
-                
         except Exception as e:
             print(f"❌ Error saving file version: {e}")
             return False
     
+    def save_file_version(self, file_path, file_content=None):
+        """Save a version of a text file to the database."""
+        row = self._version_row(file_path, file_content)
+        if row:
+            return self._insert_version_rows([row])
+    
     def get_file_versions(self, file_path, limit=10):
         """Get recent versions of a file."""
         try:
-            cursor = self.connection.cursor(dictionary=True)
             query = """
             SELECT id, version_timestamp, file_size, checksum, created_at
             FROM file_versions 
@@ -262,8 +605,9 @@ class DatabaseManager:
             LIMIT %s
             """
             
-            cursor.execute(query, (file_path, limit))
-            return cursor.fetchall()
+            with self._connection() as connection, connection.cursor(dictionary=True) as cursor:
+                cursor.execute(query, (file_path, limit))
+                return cursor.fetchall()
             
         except Exception as e:
             print(f"❌ Error getting file versions: {e}")
@@ -272,15 +616,15 @@ class DatabaseManager:
     def restore_file_version(self, version_id, target_path=None):
         """Restore a file to a specific version."""
         try:
-            cursor = self.connection.cursor(dictionary=True)
             query = """
             SELECT file_path, file_content 
             FROM file_versions 
             WHERE id = %s
             """
             
-            cursor.execute(query, (version_id,))
-            result = cursor.fetchone()
+            with self._connection() as connection, connection.cursor(dictionary=True) as cursor:
+                cursor.execute(query, (version_id,))
+                result = cursor.fetchone()
             
             if result:
                 file_path = target_path or result['file_path']
@@ -303,13 +647,102 @@ class DatabaseManager:
             print(f"❌ Error restoring file version: {e}")
             return False
     
+    def _route(self, op_type, args):
+        """Pick a worker so operations on the same file stay in order."""
+        if self.workers == 1:
+            return 0
+        
+        file_path = args[1] if op_type == 'log' else args[0]
+        return hash(file_path) % self.workers
+    
     def queue_operation(self, op_type, *args):
         """Queue a database operation for background processing."""
         if self.connected:
-            self.operation_queue.put((op_type, args))
+            index = self._route(op_type, args)
+            if op_type == 'log':
+                # Build the row here so the worker only binds and sends it
+                args = self._activity_row(*args)
+            
+            if op_type == 'save_version' and self._submit_read(index, args):
+                pass  # The reader pool queues the row once the file is read
+            else:
+                self._enqueue(index, op_type, args)
+    
+    def _enqueue(self, index, op_type, args):
+        """Put an operation on its worker's queue, or in overflow once the queue is full."""
+        # Once anything overflowed, later operations queue behind it
+        operation_queue = self.operation_queues[index]
+        if ((self._overflow[index] or operation_queue.qsize() >= self.max_queued)
+                and self._coalesce(index, op_type, args)):
+            return
+        operation_queue.put((op_type, args))
+    
+    def _submit_read(self, index, args):
+        """Read a version on the reader pool; False if the pool is not running."""
+        reader_pool = self.reader_pool
+        if reader_pool is None:
+            return False
+        try:
+            read = reader_pool.submit(self._version_row, *args)
+        except RuntimeError:  # Shut down by stop_worker
+            return False
+        read.add_done_callback(lambda done: self._queue_version(index, done))
+        return True
+    
+    def _queue_version(self, index, read):
+        """Hand a version row from the reader pool to its worker."""
+        try:
+            row = read.result()
+        except Exception as e:
+            print(f"❌ Error reading file version: {e}")
+            return
+        if row:
+            self._enqueue(index, 'version', row)
+    
+    def _coalesce(self, index, op_type, args):
+        """Hold an operation in the worker's overflow; False if the overflow drained meanwhile.
+        
+        A newer log per (path, event) or version per path replaces the held
+        one, whether or not the reader pool has read it yet. Any other operation is a barrier nothing after it may replace across.
+        """
+        with self._overflow_lock:
+            overflow = self._overflow[index]
+            if not overflow and self.operation_queues[index].qsize() < self.max_queued:
+                return False
+            
+            keys = self._overflow_keys[index]
+            seq = next(self._overflow_seq)
+            if op_type in ('log', 'save_version', 'version'):
+                # Unread saves and read rows both lead with the file path
+                key = ('log', args[2], args[1]) if op_type == 'log' else ('version', args[0])
+                superseded = keys.pop(key, None)
+                if superseded is not None:
+                    del overflow[superseded]
+                keys[key] = seq
+            else:
+                keys.clear()
+            overflow[seq] = (op_type, args)
+            return True
+    
+    def _drain_overflow(self, index):
+        """Take the operations held for a worker since its last batch, oldest first."""
+        if not self._overflow[index]:
+            return []
+        with self._overflow_lock:
+            overflow, self._overflow[index] = self._overflow[index], {}
+            self._overflow_keys[index] = {}
+        return list(overflow.values())
     
     def stop_worker(self):
-        """Stop the background worker thread."""
-        if self.worker_thread and self.worker_thread.is_alive():
-            self.operation_queue.put(None)  # Shutdown signal
-            self.worker_thread.join(timeout=5)
+        """Stop the background worker threads."""
+        alive = [t for t in self.worker_threads if t.is_alive()]
+        
+        # Let in-flight reads reach their queues ahead of the shutdown signal
+        if self.reader_pool:
+            self.reader_pool.shutdown(wait=True)
+            self.reader_pool = None
+        
+        for operation_queue in self.operation_queues:
+            operation_queue.put(None)  # Shutdown signal
+        for thread in alive:
+            thread.join(timeout=5)
@@ -6,24 +6,89 @@ Handles file system events with SFTP synchronization and database logging.
 """
 
 import os
+import re
 import sys
+import stat
 import time
+import threading
+import functools
+import fnmatch
+import posixpath
 import mimetypes
 import json
-from pathlib import Path
-from watchdog.events import FileSystemEventHandler, FileSystemEvent
+import logging
+from watchdog.events import FileSystemEventHandler
 from datetime import datetime
 
+from .config_loader import load_config
+from .path_utils import file_suffix
+
+# Characters that make an ignore pattern a glob rather than a plain name
+GLOB_CHARS = '*?['
+
+# Repeat modify events for a path inside this window (seconds) are dropped
+MODIFY_DEBOUNCE = 0.25
+
+# Text file detection for future use
+TEXT_EXTENSIONS = frozenset({
+    '.txt', '.py', '.js', '.html', '.css', '.json', '.xml', '.yaml', '.yml',
+    '.md', '.rst', '.ini', '.cfg', '.conf', '.log', '.csv', '.tsv', '.sql',
+    '.sh', '.bash', '.zsh', '.fish', '.bat', '.cmd', '.ps1', '.r', '.java',
+    '.cpp', '.c', '.h', '.hpp', '.cs', '.php', '.rb', '.go', '.rs', '.swift',
+    '.kt', '.scala', '.clj', '.hs', '.ml', '.fs', '.vb', '.pl', '.pm', '.tcl',
+    '.lua', '.scm', '.el', '.vim', '.tex', '.bib', '.sty', '.cls', '.dtx',
+    '.ltx', '.aux', '.bbl', '.blg', '.fdb_latexmk', '.fls', '.out', '.synctex.gz'
+})
+
+# Printable ASCII plus tab, newline and carriage return
+TEXT_BYTES = bytes([9, 10, 13]) + bytes(range(32, 127))
+
+
+@functools.lru_cache(maxsize=1024)
+def _extension_is_text(file_ext):
+    """Whether an extension alone marks a file as text; cached per extension."""
+    if file_ext in TEXT_EXTENSIONS:
+        return True
+    mime_type, _ = mimetypes.guess_type('file' + file_ext)
+    return bool(mime_type and mime_type.startswith('text/'))
+
+
+@functools.lru_cache(maxsize=4096)
+def _sniff_text(file_path, mtime_ns, size):
+    """Guess whether a file is text from its first bytes; cached per file revision."""
+    try:
+        with open(file_path, 'rb') as f:
+            chunk = f.read(1024)
+    except (IOError, OSError):
+        return False
+    if not chunk:
+        return False
+    
+    # translate() strips the text bytes in C; what is left is the binary count
+    binary_chars = len(chunk.translate(None, TEXT_BYTES))
+    return (len(chunk) - binary_chars) / len(chunk) > 0.7
+
 
 class FileChangeHandler(FileSystemEventHandler):
     """Handler for file system events with SFTP synchronization and database logging."""
     
     def __init__(self, ignore_patterns=None, ignore_config_file=None, sftp_manager=None, 
-                 db_manager=None, local_base_path=None, mode='CLIENT'):
+                 db_manager=None, local_base_path=None, mode='CLIENT', remote_base=None,
+                 ignore_folders=None, ignore_files=None, logger=None):
         super().__init__()
         
+        # Event lines are logged rather than printed so output can be queued
+        self.logger = logger or logging.getLogger('filemon')
+        
+        # Folder/file names already loaded by the caller, if any
+        self.ignore_folders = frozenset(ignore_folders or ())
+        self.ignore_files = frozenset(ignore_files or ())
+        
         # Load ignore patterns from config file if provided
         self.ignore_patterns = self.load_ignore_patterns(ignore_patterns, ignore_config_file)
+        self._ignore_re = self.compile_ignore_patterns(self.ignore_patterns)
+        self._ignore_names = frozenset(p for p in self.ignore_patterns
+                                       if not any(char in p for char in GLOB_CHARS))
         
         # Managers
         self.sftp_manager = sftp_manager
@@ -31,90 +96,97 @@ class FileChangeHandler(FileSystemEventHandler):
         self.local_base_path = local_base_path
         self.mode = mode.upper()
         
+        # Remote root that queued SFTP paths are resolved against
+        if remote_base is None and sftp_manager:
+            remote_base = sftp_manager.remote_path
+        self.remote_base = remote_base or '/'
+        self._local_prefix = os.path.join(local_base_path, '') if local_base_path else None
+        
+        # Modify debounce state; a suppressed modify is replayed when its window
+        # ends, or as soon as the writer closes the file
+        self._last_modified = {}
+        self._debounced = {}
+        self._debounce_cv = threading.Condition()
+        self._sweeper = None
+        self._next_prune = 0.0
+        
         # Text file detection for future use
-        self.text_extensions = {
-            '.txt', '.py', '.js', '.html', '.css', '.json', '.xml', '.yaml', '.yml',
-            '.md', '.rst', '.ini', '.cfg', '.conf', '.log', '.csv', '.tsv', '.sql',
-            '.sh', '.bash', '.zsh', '.fish', '.bat', '.cmd', '.ps1', '.r', '.java',
-            '.cpp', '.c', '.h', '.hpp', '.cs', '.php', '.rb', '.go', '.rs', '.swift',
-            '.kt', '.scala', '.clj', '.hs', '.ml', '.fs', '.vb', '.pl', '.pm', '.tcl',
-            '.lua', '.scm', '.el', '.vim', '.tex', '.bib', '.sty', '.cls', '.dtx',
-            '.ltx', '.aux', '.bbl', '.blg', '.fdb_latexmk', '.fls', '.out', '.synctex.gz'
-        }
+        self.text_extensions = TEXT_EXTENSIONS
     
     def load_ignore_patterns(self, ignore_patterns, config_file):
         """Load ignore patterns from command line and/or config file."""
-        patterns = []
+        patterns = set()
         
         # Add default patterns
         default_patterns = ['.git', '__pycache__', '.DS_Store', '.Trash', 'Thumbs.db']
-        patterns.extend(default_patterns)
+        patterns.update(default_patterns)
+        patterns.update(self.ignore_folders)
+        patterns.update(self.ignore_files)
         
         # Add command line patterns
         if ignore_patterns:
-            patterns.extend([pattern.strip() for pattern in ignore_patterns.split(',')])
+            patterns.update(pattern.strip() for pattern in ignore_patterns.split(','))
         
         # Load from config file
         if config_file and os.path.exists(config_file):
             try:
-                with open(config_file, 'r') as f:
-                    config = json.load(f)
-                    if 'ignore_patterns' in config:
-                        patterns.extend(config['ignore_patterns'])
-                    if 'ignore_folders' in config:
-                        patterns.extend(config['ignore_folders'])
-                    if 'ignore_files' in config:
-                        patterns.extend(config['ignore_files'])
+                config = load_config(config_file)
+                if 'ignore_patterns' in config:
+                    patterns.update(config['ignore_patterns'])
+                if 'ignore_folders' in config and not self.ignore_folders:
+                    patterns.update(config['ignore_folders'])
+                if 'ignore_files' in config and not self.ignore_files:
+                    patterns.update(config['ignore_files'])
             except (json.JSONDecodeError, IOError) as e:
                 print(f"Warning: Could not load config file {config_file}: {e}", file=sys.stderr)
         
         # Remove duplicates and empty patterns
-        return list(set([p for p in patterns if p]))
+        patterns.discard('')
+        return list(patterns)
+    
+    def stat_file(self, file_path):
+        """Stat a path once per event, or None if it is gone."""
+        try:
+            return os.stat(file_path)
+        except OSError:
+            return None
     
-    def is_text_file(self, file_path):
+    def is_text_file(self, file_path, st=None):
         """Check if a file is text-based (preserved for future use)."""
-        if not os.path.isfile(file_path):
+        if st is None:
+            st = self.stat_file(file_path)
+        if st is None or not stat.S_ISREG(st.st_mode):
             return False
         
-        # Check file extension first
-        file_ext = Path(file_path).suffix.lower()
-        if file_ext in self.text_extensions:
+        # Check the extension list and MIME type, both decided per extension
+        if _extension_is_text(file_suffix(file_path).lower()):
             return True
         
-        # Check MIME type
-        mime_type, _ = mimetypes.guess_type(file_path)
-        if mime_type and mime_type.startswith('text/'):
-            return True
+        # Fallback: sniff the first bytes, skipped while the file is unchanged
+        return _sniff_text(file_path, st.st_mtime_ns, st.st_size)
+    
+    def compile_ignore_patterns(self, patterns):
+        """Compile ignore patterns into a single regex.
         
-        # Fallback: try to read first few bytes to detect text
-        try:
-            with open(file_path, 'rb') as f:
-                chunk = f.read(1024)
-                # Check if the chunk contains mostly printable characters
-                text_chars = sum(1 for byte in chunk if 32 <= byte <= 126 or byte in (9, 10, 13))
-                return text_chars / len(chunk) > 0.7 if chunk else False
-        except (IOError, OSError):
-            return False
+        Plain patterns match anywhere in the path; glob patterns (*, ?, [)
+        match a trailing path component such as a file name.
+        """
+        alternatives = []
+        for pattern in patterns:
+            if any(char in pattern for char in GLOB_CHARS):
+                alternatives.append(r'(?:^|[\\/])' + fnmatch.translate(pattern))
+            else:
+                alternatives.append(re.escape(pattern))
+        
+        return re.compile('|'.join(alternatives)) if alternatives else None
     
     def should_ignore(self, path):
         """Check if a path should be ignored."""
-        path_str = str(path)
-        path_parts = Path(path).parts
-        
-        for pattern in self.ignore_patterns:
-            # Check if pattern is in path
-            if pattern in path_str:
-                return True
-            
-            # Check if pattern matches any path component
-            if pattern in path_parts:
-                return True
-            
-            # Check for exact filename/directory match
-            if os.path.basename(path) == pattern:
-                return True
-        
-        return False
+        path = str(path)
+        # A component equal to a plain pattern (.git, node_modules) skips the regex
+        if not self._ignore_names.isdisjoint(path.split(os.sep)):
+            return True
+        return self._ignore_re is not None and self._ignore_re.search(path) is not None
     
     def get_relative_path(self, file_path):
         """Get relative path from base directory."""
@@ -125,13 +197,26 @@ class FileChangeHandler(FileSystemEventHandler):
                 return file_path
         return file_path
     
-    def get_file_size(self, file_path):
+    def get_remote_path(self, file_path):
+        """Resolve the canonical full remote path for a local file at enqueue time.
+        
+        Normalizing here gives the SFTP workers one key per remote file for
+        routing, coalescing and the directory cache.
+        """
+        if self._local_prefix and file_path.startswith(self._local_prefix):
+            relative_path = file_path[len(self._local_prefix):]
+        else:
+            relative_path = self.get_relative_path(file_path)
+        
+        return posixpath.normpath(
+            posixpath.join(self.remote_base, relative_path.replace(os.sep, '/').lstrip('/')))
+    
+    def get_file_size(self, file_path, st=None):
         """Get file size in bytes."""
-        try:
-            if os.path.isfile(file_path):
-                return os.path.getsize(file_path)
-        except (OSError, IOError):
-            pass
+        if st is None:
+            st = self.stat_file(file_path)
+        if st is not None and stat.S_ISREG(st.st_mode):
+            return st.st_size
         return None
     
     def format_event(self, event_type, file_path, is_text=None):
@@ -145,10 +230,10 @@ class FileChangeHandler(FileSystemEventHandler):
         else:
             return f"[{timestamp}] {event_type}: {file_path}"
     
-    def log_to_database(self, event_type, file_path, old_path=None, new_path=None, is_text=None):
-        """Log event to database if in HOST mode."""
+    def log_to_database(self, event_type, file_path, old_path=None, new_path=None, is_text=None, st=None):
+        """Log event to database if in HOST mode; st is the event's stat result, if any."""
         if self.mode == 'HOST' and self.db_manager and self.db_manager.connected:
-            file_size = self.get_file_size(file_path) if file_path else None
+            file_size = self.get_file_size(file_path, st) if st is not None else None
             self.db_manager.queue_operation('log', event_type, file_path, old_path, new_path, 
                                           file_size, is_text, 'PENDING')
             
@@ -159,46 +244,118 @@ class FileChangeHandler(FileSystemEventHandler):
     def on_created(self, event):
         """Handle file creation events."""
         if not event.is_directory and not self.should_ignore(event.src_path):
+            # One stat serves text detection and the logged size
+            st = self.stat_file(event.src_path)
+            
             # Check if it's a text file for future use
-            is_text = self.is_text_file(event.src_path)
-            print(self.format_event("CREATED", event.src_path, is_text))
+            is_text = self.is_text_file(event.src_path, st)
+            self.logger.info(self.format_event("CREATED", event.src_path, is_text))
             
             # Log to database (HOST mode)
-            self.log_to_database("CREATED", event.src_path, is_text=is_text)
+            self.log_to_database("CREATED", event.src_path, is_text=is_text, st=st)
             
             # Sync to SFTP
-            if self.sftp_manager and self.sftp_manager.connected:
-                relative_path = self.get_relative_path(event.src_path)
-                self.sftp_manager.queue_operation('upload', event.src_path, relative_path)
+            if self.sftp_manager and self.sftp_manager.accepting:
+                remote_path = self.get_remote_path(event.src_path)
+                self.sftp_manager.queue_operation('upload', event.src_path, remote_path)
+    
+    def debounce_modified(self, file_path):
+        """Return True if a modify event repeats one handled for file_path just before."""
+        now = time.monotonic()
+        with self._debounce_cv:
+            last = self._last_modified.get(file_path, float('-inf'))
+            if now - last < MODIFY_DEBOUNCE:
+                if file_path not in self._debounced:
+                    self._debounced[file_path] = last + MODIFY_DEBOUNCE
+                    self._start_sweeper()
+                    self._debounce_cv.notify()
+                return True
+            self._last_modified[file_path] = now
+            
+            # Forget paths that have been quiet for a minute
+            if now >= self._next_prune:
+                self._last_modified = {p: t for p, t in self._last_modified.items() if now - t < 60}
+                self._next_prune = now + 60
+        return False
+    
+    def _take_debounced(self, file_path):
+        """Claim a suppressed modify of file_path; True if one was pending."""
+        with self._debounce_cv:
+            if self._debounced.pop(file_path, None) is None:
+                return False
+            self._last_modified[file_path] = time.monotonic()
+            return True
+    
+    def _start_sweeper(self):
+        """Start the replay thread on first use (called with the debounce lock held)."""
+        if self._sweeper is None:
+            self._sweeper = threading.Thread(target=self._replay_debounced, daemon=True)
+            self._sweeper.start()
+    
+    def _replay_debounced(self):
+        """Handle the last suppressed modify of each path once its window has passed."""
+        while True:
+            with self._debounce_cv:
+                while True:
+                    now = time.monotonic()
+                    due = [p for p, deadline in self._debounced.items() if deadline <= now]
+                    if due:
+                        break
+                    timeout = min(self._debounced.values()) - now if self._debounced else None
+                    self._debounce_cv.wait(timeout)
+                for file_path in due:
+                    del self._debounced[file_path]
+                    self._last_modified[file_path] = now
+            
+            for file_path in due:
+                try:
+                    self.handle_modified(file_path)
+                except Exception as e:
+                    print(f"❌ Error replaying modification of {file_path}: {e}", file=sys.stderr)
     
     def on_modified(self, event):
         """Handle file modification events."""
         if not event.is_directory and not self.should_ignore(event.src_path):
-            # Check if it's a text file for future use
-            is_text = self.is_text_file(event.src_path)
-            print(self.format_event("MODIFIED", event.src_path, is_text))
-            
-            # Log to database (HOST mode)
-            self.log_to_database("MODIFIED", event.src_path, is_text=is_text)
-            
-            # Sync to SFTP
-            if self.sftp_manager and self.sftp_manager.connected:
-                relative_path = self.get_relative_path(event.src_path)
-                self.sftp_manager.queue_operation('upload', event.src_path, relative_path)
+            if not self.debounce_modified(event.src_path):
+                self.handle_modified(event.src_path)
+    
+    def on_closed(self, event):
+        """Replay a debounced modification as soon as the writer closes the file."""
+        if self._take_debounced(event.src_path):
+            self.handle_modified(event.src_path)
+    
+    def handle_modified(self, file_path):
+        """Log, version and sync a modified file."""
+        # One stat serves text detection and the logged size
+        st = self.stat_file(file_path)
+        
+        # Check if it's a text file for future use
+        is_text = self.is_text_file(file_path, st)
+        self.logger.info(self.format_event("MODIFIED", file_path, is_text))
+        
+        # Log to database (HOST mode)
+        self.log_to_database("MODIFIED", file_path, is_text=is_text, st=st)
+        
+        # Sync to SFTP
+        if self.sftp_manager and self.sftp_manager.accepting:
+            remote_path = self.get_remote_path(file_path)
+            self.sftp_manager.queue_operation('upload', file_path, remote_path)
     
     def on_deleted(self, event):
         """Handle file deletion events."""
         if not event.is_directory and not self.should_ignore(event.src_path):
+            self._take_debounced(event.src_path)  # Nothing left to replay
+            
             # For deleted files, we can't check if they were text files
-            print(self.format_event("DELETED", event.src_path))
+            self.logger.info(self.format_event("DELETED", event.src_path))
             
             # Log to database (HOST mode)
             self.log_to_database("DELETED", event.src_path)
             
             # Sync to SFTP
-            if self.sftp_manager and self.sftp_manager.connected:
-                relative_path = self.get_relative_path(event.src_path)
-                self.sftp_manager.queue_operation('delete', relative_path)
+            if self.sftp_manager and self.sftp_manager.accepting:
+                remote_path = self.get_remote_path(event.src_path)
+                self.sftp_manager.queue_operation('delete', remote_path)
     
     def on_moved(self, event):
         """Handle file move/rename events."""
@@ -208,14 +365,20 @@ class FileChangeHandler(FileSystemEventHandler):
             
             if not self.should_ignore(src_path) and not self.should_ignore(dest_path):
                 # Check if destination is a text file for future use
-                is_text = self.is_text_file(dest_path) if os.path.exists(dest_path) else None
-                print(self.format_event("MOVED", f"{src_path} -> {dest_path}", is_text))
+                st = self.stat_file(dest_path)
+                is_text = self.is_text_file(dest_path, st) if st is not None else None
+                self.logger.info(self.format_event("MOVED", f"{src_path} -> {dest_path}", is_text))
                 
                 # Log to database (HOST mode)
-                self.log_to_database("MOVED", dest_path, old_path=src_path, new_path=dest_path, is_text=is_text)
+                self.log_to_database("MOVED", dest_path, old_path=src_path, new_path=dest_path,
+                                     is_text=is_text, st=st)
                 
                 # Sync to SFTP
-                if self.sftp_manager and self.sftp_manager.connected:
-                    old_relative_path = self.get_relative_path(src_path)
-                    new_relative_path = self.get_relative_path(dest_path)
-                    self.sftp_manager.queue_operation('move', old_relative_path, new_relative_path)
+                if self.sftp_manager and self.sftp_manager.accepting:
+                    old_remote_path = self.get_remote_path(src_path)
+                    new_remote_path = self.get_remote_path(dest_path)
+                    self.sftp_manager.queue_operation('move', old_remote_path, new_remote_path)
+                
+                # A modification still held back for the old name belongs to the new one
+                if self._take_debounced(src_path):
+                    self.handle_modified(dest_path)
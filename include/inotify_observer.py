@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Inotify Observer for File Monitor Service
+
+Native Linux inotify backend that feeds events straight to a watchdog event
+handler, skipping the move-matching delay of watchdog's InotifyBuffer.
+"""
+
+import os
+import sys
+import errno
+import struct
+import select
+import threading
+import ctypes
+import ctypes.util
+
+from watchdog.events import (
+    FileCreatedEvent, DirCreatedEvent,
+    FileModifiedEvent, DirModifiedEvent,
+    FileDeletedEvent, DirDeletedEvent,
+    FileMovedEvent, DirMovedEvent,
+    FileClosedEvent
+)
+
+# inotify event bits (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+
+# inotify_init1 flags share their values with O_NONBLOCK / O_CLOEXEC
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, 'O_CLOEXEC', 0o2000000)
+
+# Only the events the handler acts on, not IN_ALL_EVENTS
+WATCH_MASK = (IN_CREATE | IN_MODIFY | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CLOSE_WRITE | IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK)
+
+EVENT_HEADER = struct.Struct('iIII')
+READ_SIZE = 64 * 1024
+
+# libc bindings (Linux only)
+INOTIFY_AVAILABLE = False
+_libc = None
+if sys.platform.startswith('linux'):
+    try:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        _libc.inotify_init1.argtypes = [ctypes.c_int]
+        _libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        _libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        INOTIFY_AVAILABLE = True
+    except (OSError, AttributeError):
+        INOTIFY_AVAILABLE = False
+
+
+class InotifyObserver(threading.Thread):
+    """Observer driving an inotify fd from an epoll loop.
+
+    Mirrors the parts of the watchdog Observer API used by the service
+    (schedule/start/stop/join), so either can be used interchangeably.
+    """
+
+    def __init__(self, ignore_dirs=None):
+        super().__init__(daemon=True)
+        self.ignore_dirs = frozenset(ignore_dirs or ())
+
+        self._fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_init1 failed: {os.strerror(err)}")
+
+        # Wakeup fd so stop() interrupts the epoll wait immediately
+        if hasattr(os, 'eventfd'):
+            self._wake_r = self._wake_w = os.eventfd(0, os.EFD_NONBLOCK | os.EFD_CLOEXEC)
+        else:
+            self._wake_r, self._wake_w = os.pipe()
+
+        self._epoll = select.epoll()
+        self._epoll.register(self._fd, select.EPOLLIN)
+        self._epoll.register(self._wake_r, select.EPOLLIN)
+
+        self._watches = {}  # wd -> [path, handler, recursive]
+        self._wds = {}      # path -> wd
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def schedule(self, event_handler, path, recursive=False):
+        """Watch a directory (and its non-ignored subdirectories if recursive)."""
+        path = os.path.abspath(path)
+        if recursive:
+            self._watch_tree(path, event_handler)
+        else:
+            self._add_watch(path, event_handler, False)
+
+    def _watch_tree(self, root, event_handler, emit_created=False):
+        """Add watches for a directory tree, pruning ignored folders."""
+        for dirpath, dirnames, filenames in os.walk(root, topdown=True, followlinks=False):
+            dirnames[:] = [d for d in dirnames if d not in self.ignore_dirs]
+            self._add_watch(dirpath, event_handler, True)
+
+            # Anything created before the watch existed would otherwise be missed
+            if emit_created:
+                for name in dirnames:
+                    self._dispatch(event_handler, DirCreatedEvent(os.path.join(dirpath, name)))
+                for name in filenames:
+                    self._dispatch(event_handler, FileCreatedEvent(os.path.join(dirpath, name)))
+
+    def _add_watch(self, path, event_handler, recursive):
+        """Register a single inotify watch."""
+        wd = _libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                print(f"Warning: inotify watch limit reached, not watching {path} "
+                      "(raise fs.inotify.max_user_watches)", file=sys.stderr)
+            elif err not in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                print(f"Warning: Could not watch {path}: {os.strerror(err)}", file=sys.stderr)
+            return None
+
+        with self._lock:
+            self._watches[wd] = [path, event_handler, recursive]
+            self._wds[path] = wd
+        return wd
+
+    def _remove_tree(self, root):
+        """Drop watches for a directory tree that left the monitored area."""
+        prefix = root + os.sep
+        with self._lock:
+            stale = [p for p in self._wds if p == root or p.startswith(prefix)]
+            wds = [self._wds.pop(p) for p in stale]
+        for wd in wds:
+            _libc.inotify_rm_watch(self._fd, wd)
+
+    def _rename_tree(self, old_root, new_root):
+        """Rewrite watched paths after a directory was moved within the tree."""
+        prefix = old_root + os.sep
+        with self._lock:
+            for path in [p for p in self._wds if p == old_root or p.startswith(prefix)]:
+                wd = self._wds.pop(path)
+                new_path = new_root + path[len(old_root):]
+                self._wds[new_path] = wd
+                if wd in self._watches:
+                    self._watches[wd][0] = new_path
+
+    def run(self):
+        """Epoll loop: block until inotify or the wakeup fd is readable."""
+        try:
+            while not self._stopped.is_set():
+                for fd, _ in self._epoll.poll():
+                    if fd == self._fd:
+                        self._process(self._read_events())
+        finally:
+            self._close()
+
+    def _read_events(self):
+        """Read and decode every pending inotify event."""
+        events = []
+        while True:
+            try:
+                data = os.read(self._fd, READ_SIZE)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+                events.append((wd, mask, cookie, name))
+        return events
+
+    def _process(self, events):
+        """Translate raw inotify events into watchdog events."""
+        # Pair moves within this read; the kernel queues FROM/TO back to back
+        moved_to = {}
+        for wd, mask, cookie, name in events:
+            if mask & IN_MOVED_TO:
+                moved_to[cookie] = (wd, name)
+        paired = set()
+
+        for wd, mask, cookie, name in events:
+            if mask & IN_Q_OVERFLOW:
+                print("Warning: inotify event queue overflowed, some events were lost", file=sys.stderr)
+                continue
+
+            with self._lock:
+                watch = self._watches.get(wd)
+                if mask & IN_IGNORED:
+                    watch = self._watches.pop(wd, None)
+                    if watch and self._wds.get(watch[0]) == wd:
+                        del self._wds[watch[0]]
+                    continue
+            if not watch:
+                continue
+
+            dir_path, handler, recursive = watch
+            path = os.path.join(dir_path, name)
+            is_dir = bool(mask & IN_ISDIR)
+
+            if mask & IN_CREATE:
+                self._dispatch(handler, DirCreatedEvent(path) if is_dir else FileCreatedEvent(path))
+                if is_dir and recursive and name not in self.ignore_dirs:
+                    self._watch_tree(path, handler, emit_created=True)
+
+            elif mask & IN_MODIFY:
+                self._dispatch(handler, DirModifiedEvent(path) if is_dir else FileModifiedEvent(path))
+
+            elif mask & IN_CLOSE_WRITE:
+                self._dispatch(handler, FileClosedEvent(path))
+
+            elif mask & IN_DELETE:
+                self._dispatch(handler, DirDeletedEvent(path) if is_dir else FileDeletedEvent(path))
+
+            elif mask & IN_MOVED_FROM:
+                target = moved_to.get(cookie)
+                with self._lock:
+                    target_watch = self._watches.get(target[0]) if target else None
+                if target_watch:
+                    paired.add(cookie)
+                    dest_path = os.path.join(target_watch[0], target[1])
+                    if is_dir:
+                        self._rename_tree(path, dest_path)
+                    self._dispatch(handler, DirMovedEvent(path, dest_path) if is_dir
+                                   else FileMovedEvent(path, dest_path))
+                    if is_dir:
+                        self._dispatch_sub_moves(handler, path, dest_path)
+                else:
+                    # Moved out of the watched tree
+                    if is_dir:
+                        self._remove_tree(path)
+                    self._dispatch(handler, DirDeletedEvent(path) if is_dir else FileDeletedEvent(path))
+
+            elif mask & IN_MOVED_TO and cookie not in paired:
+                # Moved in from outside the watched tree
+                self._dispatch(handler, DirCreatedEvent(path) if is_dir else FileCreatedEvent(path))
+                if is_dir and recursive and name not in self.ignore_dirs:
+                    self._watch_tree(path, handler, emit_created=True)
+
+    def _dispatch_sub_moves(self, event_handler, old_root, new_root):
+        """Emit a move for everything inside a renamed directory, as watchdog does."""
+        for dirpath, dirnames, filenames in os.walk(new_root, topdown=True, followlinks=False):
+            dirnames[:] = [d for d in dirnames if d not in self.ignore_dirs]
+            old_dirpath = old_root + dirpath[len(new_root):]
+            moves = ([DirMovedEvent(os.path.join(old_dirpath, name), os.path.join(dirpath, name))
+                      for name in dirnames] +
+                     [FileMovedEvent(os.path.join(old_dirpath, name), os.path.join(dirpath, name))
+                      for name in filenames])
+            for event in moves:
+                event.is_synthetic = True
+                self._dispatch(event_handler, event)
+
+    def _dispatch(self, event_handler, event):
+        """Hand an event to the handler without letting it kill the loop."""
+        try:
+            event_handler.dispatch(event)
+        except Exception as e:
+            print(f"❌ Event handler error: {e}")
+
+    def stop(self):
+        """Signal the epoll loop to exit."""
+        self._stopped.set()
+        try:
+            os.write(self._wake_w, (1).to_bytes(8, sys.byteorder))
+        except OSError:
+            pass
+
+    def _close(self):
+        """Release the inotify, epoll and wakeup fds."""
+        self._epoll.close()
+        for fd in {self._fd, self._wake_r, self._wake_w}:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
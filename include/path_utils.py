@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+Path Utilities for File Monitor Service
+
+Small string-level path helpers used on every file system event.
+"""
+
+import os
+
+
+def file_suffix(path):
+    """Return the extension of the last path component, as os.path.splitext does.
+    
+    Works on the string directly instead of going through pathlib; names such
+    as .bashrc have no extension.
+    """
+    sep = path.rfind(os.sep)
+    if os.altsep:
+        sep = max(sep, path.rfind(os.altsep))
+    
+    dot = path.rfind('.')
+    if dot <= sep + 1:
+        return ''
+    if path[sep + 1] == '.':  # Leading dots never start an extension
+        return os.path.splitext(path)[1]
+    return path[dot:]
@@ -8,25 +8,70 @@ Manages SFTP connection and operations for file synchronization.
 import os
 import sys
 import json
+import shlex
+import socket
+import logging
+import stat
+import posixpath
+import tarfile
+import itertools
 import threading
+import time
 import queue
+import asyncio
 from pathlib import Path
 
+from .batched_queue import BatchedQueue
+
 # SFTP imports
 try:
     import paramiko
     from paramiko import SSHClient, AutoAddPolicy
+    from paramiko.sftp import CMD_REMOVE, CMD_RENAME, CMD_STAT, CMD_STATUS, CMD_ATTRS
+    from paramiko.sftp_attr import SFTPAttributes
     SFTP_AVAILABLE = True
 except ImportError:
     SFTP_AVAILABLE = False
-    print("Warning: paramiko not installed. SFTP sync will be disabled.")
-    print("Install with: sudo apt install python3-paramiko")
+
+# Optional faster upload backend
+try:
+    import asyncssh
+    ASYNCSSH_AVAILABLE = True
+except ImportError:
+    ASYNCSSH_AVAILABLE = False
+
+# Per-operation messages go through the service's queued 'filemon' logger
+log = logging.getLogger('filemon.sftp')
+
+if not SFTP_AVAILABLE:
+    log.warning("Warning: paramiko not installed. SFTP sync will be disabled.\n"
+                "Install with: sudo apt install python3-paramiko")
+
+
+def _local_stat(path):
+    """os.stat that returns None for a missing file (the upload then reports it)."""
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+
+class _Replies:
+    """Collects the responses to pipelined SFTP requests by request number."""
+    
+    def __init__(self):
+        self.replies = {}
+    
+    def _async_response(self, t, msg, num):
+        self.replies[num] = (t, msg)
 
 
 class SFTPManager:
     """Manages SFTP connection and operations."""
     
-    def __init__(self, host, username, password=None, key_file=None, port=22, remote_path="/"):
+    def __init__(self, host, username, password=None, key_file=None, port=22, remote_path="/",
+                 channels=1, compress=True, debounce_ms=100, skip_unchanged=False,
+                 backend='auto', max_queued=10000):
         self.host = host
         self.username = username
         self.password = password
@@ -36,9 +81,58 @@ class SFTPManager:
         self.client = None
         self.sftp = None
         self.connected = False
-        self.operation_queue = queue.Queue()
-        self.worker_thread = None
+        self.compress = compress
+        
+        # Skip uploads whose remote copy has the same size and mtime; uploads
+        # then copy the local mtime to the remote file so the check holds
+        self.skip_unchanged = skip_unchanged
+        
+        # asyncssh, when installed, carries per-file uploads on its own connection
+        # and event loop thread; paramiko still handles everything else
+        self.use_asyncssh = ASYNCSSH_AVAILABLE and backend != 'paramiko'
+        self._loop = None
+        self._async_conn = None
+        self._async_sftp = None
+        
+        # One queue and SFTP channel per worker, all sharing a single SSH transport
+        self.channels = max(1, int(channels))
+        self.operation_queues = [BatchedQueue() for _ in range(self.channels)]
+        self.worker_threads = []
+        self._routes = {}
+        self.debounce = debounce_ms / 1000.0
+        
+        # Past max_queued per worker, operations wait in an overflow map where a
+        # newer upload/delete of a path replaces the older one, bounding memory
+        self.max_queued = max_queued
+        self._overflow = [{} for _ in range(self.channels)]
+        self._overflow_paths = [{} for _ in range(self.channels)]
+        self._overflow_lock = threading.Lock()
+        self._overflow_seq = itertools.count()
+        self._local = threading.local()
+        self._connect_lock = threading.Lock()
+        self._running = False
+        
+        # Remote directories known to exist, shared by all workers
+        self._mkdir_cache = set()
+        self._mkdir_lock = threading.Lock()
         
+        # Cleared if the server won't run tar for us (e.g. an SFTP-only account)
+        self._bulk_upload = True
+        
+    # Transport tuning for bulk uploads: a wider SSH window avoids stalls on
+    # the bandwidth-delay product
+    WINDOW_SIZE = 3 * 1024 * 1024
+    MAX_PACKET_SIZE = 256 * 1024
+    
+    # Largest write whose SFTP WRITE request fits in one SSH channel packet, not
+    # a typo for 32768. paramiko's Channel sends at most out_max_packet_size - 64
+    # bytes per packet (32704 against OpenSSH's 32 KiB session channel). The
+    # request adds 25 header bytes plus OpenSSH's 4-byte handle around the data.
+    # A full 32 KiB write is split into a full packet and a small tail packet,
+    # and waiting on the window for each tail is the reported write slowdown
+    UPLOAD_CHUNK = 32675
+    KEEPALIVE_INTERVAL = 30
+    
     def connect(self):
         """Establish SFTP connection."""
         try:
@@ -50,17 +144,22 @@ class SFTPManager:
                     self.host, 
                     port=self.port,
                     username=self.username,
-                    key_filename=self.key_file
+                    key_filename=self.key_file,
+                    compress=self.compress
                 )
             else:
                 self.client.connect(
                     self.host, 
                     port=self.port,
                     username=self.username,
-                    password=self.password
+                    password=self.password,
+                    compress=self.compress
                 )
             
+            self._tune_transport(self.client.get_transport())
             self.sftp = self.client.open_sftp()
+            if self.use_asyncssh:
+                self._connect_asyncssh()
             self.connected = True
             print(f"✅ Connected to SFTP server: {self.username}@{self.host}:{self.port}")
             return True
@@ -70,8 +169,76 @@ class SFTPManager:
             self.connected = False
             return False
     
+    def _tune_transport(self, transport):
+        """Widen the window for channels opened on this transport and defer rekeying."""
+        transport.default_window_size = self.WINDOW_SIZE
+        transport.default_max_packet_size = self.MAX_PACKET_SIZE
+        transport.packetizer.REKEY_BYTES = pow(2, 40)
+        transport.packetizer.REKEY_PACKETS = pow(2, 40)
+        
+        # Small SFTP requests shouldn't wait on Nagle, and idle workers
+        # shouldn't find the connection silently dropped by a NAT or firewall
+        try:
+            transport.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except (AttributeError, OSError):
+            pass  # Not a TCP socket (e.g. a ProxyCommand)
+        transport.set_keepalive(self.KEEPALIVE_INTERVAL)
+    
+    def _compressed_transport(self):
+        """True if the negotiated SSH stream is zlib-compressed."""
+        transport = self.client.get_transport() if self.client else None
+        return transport is not None and transport.local_compression not in (None, 'none')
+    
+    def _connect_asyncssh(self):
+        """Open the asyncssh connection used for uploads, falling back to paramiko on failure."""
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+            threading.Thread(target=self._loop.run_forever, daemon=True).start()
+        
+        self._close_asyncssh()
+        try:
+            self._async_conn, self._async_sftp = self._run_async(self._open_asyncssh())
+        except Exception as e:
+            log.warning("Warning: asyncssh connection failed, uploading with paramiko: %s", e)
+    
+    async def _open_asyncssh(self):
+        """Connect with asyncssh using the same credentials and host key policy as paramiko."""
+        options = dict(port=self.port, username=self.username, known_hosts=None,
+                       compression_algs=['zlib@openssh.com', 'none'] if self.compress else ['none'])
+        if self.key_file:
+            options['client_keys'] = [self.key_file]
+        else:
+            options['password'] = self.password
+        
+        conn = await asyncssh.connect(self.host, **options)
+        return conn, await conn.start_sftp_client()
+    
+    def _close_asyncssh(self):
+        """Drop the asyncssh connection, if any."""
+        conn, self._async_conn, self._async_sftp = self._async_conn, None, None
+        if conn is not None:
+            self._loop.call_soon_threadsafe(conn.close)
+    
+    def _run_async(self, coroutine):
+        """Run a coroutine on the asyncssh event loop and wait for its result."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+    
+    def _async_put(self, local_path, full_remote_path):
+        """Upload through asyncssh; False if that backend isn't available."""
+        sftp = self._async_sftp
+        if sftp is None:
+            return False
+        try:
+            self._run_async(sftp.put(local_path, full_remote_path, preserve=self.skip_unchanged))
+            return True
+        except (asyncssh.SFTPConnectionLost, asyncssh.DisconnectError) as e:
+            log.warning("Warning: asyncssh connection lost, uploading with paramiko: %s", e)
+            self._close_asyncssh()
+            return False
+    
     def disconnect(self):
         """Close SFTP connection."""
+        self._close_asyncssh()
         if self.sftp:
             self.sftp.close()
         if self.client:
@@ -79,98 +246,488 @@ class SFTPManager:
         self.connected = False
         print("🔌 SFTP connection closed")
     
+    def _get_sftp(self):
+        """Return the SFTP channel for the calling thread (each worker owns one)."""
+        sftp = getattr(self._local, 'sftp', None)
+        return sftp if sftp is not None else self.sftp
+    
+    def _open_worker_channel(self):
+        """Open a dedicated SFTP channel for this worker on the shared transport."""
+        stale = getattr(self._local, 'sftp', None)
+        if stale is not None:
+            try:
+                stale.close()  # Left over from the connection before a reconnect
+            except Exception:
+                pass
+        
+        try:
+            self._local.sftp = self.client.open_sftp()
+        except Exception as e:
+            log.warning("Warning: Could not open SFTP channel, sharing the main one: %s", e)
+            self._local.sftp = None
+        self._local.client = self.client
+    
+    def _transport_active(self):
+        """True while the shared SSH transport is up."""
+        transport = self.client.get_transport() if self.client else None
+        return self.connected and transport is not None and transport.is_active()
+    
+    def _ensure_connection(self):
+        """Give this worker a live channel, redoing the SSH handshake only if the transport died."""
+        if not self._transport_active():
+            with self._connect_lock:
+                if not self._transport_active():
+                    log.warning("⚠️  SFTP not connected, attempting to reconnect...")
+                    if self.client:
+                        self.client.close()
+                    if not self.connect():
+                        self.connected = False
+                        return False
+        
+        # A closed channel on a live transport only needs reopening
+        if self.sftp.sock.closed:
+            with self._connect_lock:
+                if self.sftp.sock.closed:
+                    try:
+                        self.sftp = self.client.open_sftp()
+                    except Exception as e:
+                        log.error("❌ Could not reopen SFTP channel: %s", e)
+                        return False
+        
+        sftp = getattr(self._local, 'sftp', None)
+        if (getattr(self._local, 'client', None) is not self.client
+                or (sftp is not None and sftp.sock.closed)):
+            self._open_worker_channel()
+        return True
+    
     def ensure_remote_path(self, remote_file_path):
-        """Ensure remote directory exists."""
+        """Ensure remote directory exists, creating only the missing tail of the path."""
+        remote_dir = posixpath.dirname(remote_file_path)
         try:
-            remote_dir = os.path.dirname(remote_file_path)
-            if remote_dir:
-                self.sftp.makedirs(remote_dir, exist_ok=True)
+            self._ensure_remote_dir(self._get_sftp(), remote_dir)
         except Exception as e:
-            print(f"Warning: Could not create remote directory {remote_dir}: {e}")
+            log.warning("Warning: Could not create remote directory %s: %s", remote_dir, e)
+    
+    def _ensure_remote_dir(self, sftp, remote_dir):
+        """Create remote_dir and its missing parents, remembering what exists."""
+        if not remote_dir or remote_dir in self._mkdir_cache or remote_dir == '/':
+            return
+        
+        try:
+            exists = stat.S_ISDIR(sftp.stat(remote_dir).st_mode)
+        except IOError:
+            exists = False
+        
+        if not exists:
+            self._ensure_remote_dir(sftp, posixpath.dirname(remote_dir))
+            try:
+                sftp.mkdir(remote_dir)
+            except IOError:
+                # Another worker may have created it in the meantime
+                if not stat.S_ISDIR(sftp.stat(remote_dir).st_mode):
+                    raise
+        
+        with self._mkdir_lock:
+            self._mkdir_cache.add(remote_dir)
+    
+    def _upload_buffer(self):
+        """Return this thread's reusable read buffer (paramiko copies each write out of it)."""
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = self._local.buffer = memoryview(bytearray(self.UPLOAD_CHUNK))
+        return buffer
     
-    def upload_file(self, local_path, remote_path):
-        """Upload a file to remote location."""
+    def upload_file(self, local_path, full_remote_path, ensure_dir=True):
+        """Upload a file to a full remote path (resolved when the upload was queued)."""
         try:
-            full_remote_path = f"{self.remote_path}/{remote_path.lstrip('/')}"
-            self.ensure_remote_path(full_remote_path)
-            self.sftp.put(local_path, full_remote_path)
-            print(f"📤 Uploaded: {local_path} -> {full_remote_path}")
+            if ensure_dir:
+                self.ensure_remote_path(full_remote_path)
+            
+            if not self._async_put(local_path, full_remote_path):
+                buffer = self._upload_buffer()
+                
+                # Pipelined writes don't wait for each ACK before sending the next block
+                with self._get_sftp().open(full_remote_path, 'wb') as remote_file:
+                    remote_file.set_pipelined(True)
+                    with open(local_path, 'rb', buffering=0) as local_file:
+                        while True:
+                            count = local_file.readinto(buffer)
+                            if not count:
+                                break
+                            remote_file.write(buffer[:count])
+                        if self.skip_unchanged:
+                            st = os.fstat(local_file.fileno())
+                            remote_file.utime((st.st_atime, st.st_mtime))
+            log.info("📤 Uploaded: %s -> %s", local_path, full_remote_path)
             return True
         except Exception as e:
-            print(f"❌ Upload failed for {local_path}: {e}")
+            log.error("❌ Upload failed for %s: %s", local_path, e)
             return False
     
-    def delete_file(self, remote_path):
-        """Delete a file from remote location."""
+    def upload_files(self, pairs):
+        """Upload several (local, full remote) pairs through one tar stream over SSH.
+        
+        Files outside remote_path, or every file if the remote tar fails, go
+        through upload_file one at a time instead. Bulk upload stays off only
+        once the server refuses exec or has no tar.
+        """
+        if self.skip_unchanged:
+            pairs = self._changed(pairs)
+        
+        prefix = self.remote_path + '/'
+        bulk = [(local, remote) for local, remote in pairs if remote.startswith(prefix)]
+        single = [(local, remote) for local, remote in pairs if not remote.startswith(prefix)]
+        
+        if len(bulk) < 2 or not self._bulk_upload:
+            single, bulk = pairs, []
+        
+        if bulk:
+            try:
+                # gzip only when the SSH stream isn't compressed already
+                gzip = not self._compressed_transport()
+                command = ("tar xzf - -C " if gzip else "tar xf - -C ") + shlex.quote(self.remote_path or '/')
+                stdin, stdout, stderr = self.client.exec_command(command)
+            except Exception as e:
+                # A refused channel or exec request on a live transport won't
+                # change; a dropped connection only costs this batch
+                transport = self.client.get_transport()
+                if isinstance(e, paramiko.SSHException) and transport and transport.is_active():
+                    log.warning("Warning: Bulk upload unavailable, uploading files one by one: %s", e)
+                    self._bulk_upload = False
+                else:
+                    log.warning("Warning: Bulk upload failed, uploading files one by one: %s", e)
+                single, bulk = pairs, []
+        
+        if bulk:
+            uploaded, vanished = [], []
+            try:
+                # Follow symlinks so the remote gets the target's content, as upload_file sends
+                with tarfile.open(fileobj=stdin, mode='w|gz' if gzip else 'w|', dereference=True) as tar:
+                    for local_path, full_remote_path in bulk:
+                        try:
+                            tar.add(local_path, arcname=full_remote_path[len(prefix):], recursive=False)
+                            uploaded.append((local_path, full_remote_path))
+                        except FileNotFoundError as e:
+                            vanished.append((local_path, full_remote_path))
+                            log.error("❌ Upload failed for %s: %s", local_path, e)
+                stdin.channel.shutdown_write()
+                status = stdout.channel.recv_exit_status()
+                if status != 0:
+                    if status in (126, 127):  # The shell could not find or run tar
+                        self._bulk_upload = False
+                    raise RuntimeError(f"remote tar exited with {status}: "
+                                       f"{stderr.read().decode(errors='replace').strip()}")
+                for local_path, full_remote_path in uploaded:
+                    log.info("📤 Uploaded: %s -> %s", local_path, full_remote_path)
+            except Exception as e:
+                log.warning("Warning: Bulk upload failed, uploading files one by one: %s", e)
+                single = single + [pair for pair in bulk if pair not in vanished]
+            finally:
+                stdin.channel.close()
+        
+        # One directory check per remote directory rather than per file
+        single = sorted(single, key=lambda pair: posixpath.dirname(pair[1]))
+        for _, group in itertools.groupby(single, key=lambda pair: posixpath.dirname(pair[1])):
+            group = list(group)
+            self.ensure_remote_path(group[0][1])
+            for local_path, full_remote_path in group:
+                self.upload_file(local_path, full_remote_path, ensure_dir=False)
+    
+    def delete_file(self, full_remote_path):
+        """Delete a file at a full remote path."""
         try:
-            full_remote_path = f"{self.remote_path}/{remote_path.lstrip('/')}"
-            self.sftp.remove(full_remote_path)
-            print(f"🗑️  Deleted remote: {full_remote_path}")
+            self._get_sftp().remove(full_remote_path)
+            log.info("🗑️  Deleted remote: %s", full_remote_path)
             return True
         except Exception as e:
-            print(f"❌ Delete failed for {remote_path}: {e}")
+            log.error("❌ Delete failed for %s: %s", full_remote_path, e)
             return False
     
-    def move_file(self, old_remote_path, new_remote_path):
-        """Move/rename a file on remote location."""
+    def move_file(self, old_full_path, new_full_path):
+        """Move/rename a file between full remote paths."""
         try:
-            old_full_path = f"{self.remote_path}/{old_remote_path.lstrip('/')}"
-            new_full_path = f"{self.remote_path}/{new_remote_path.lstrip('/')}"
-            
             # Ensure new directory exists
             self.ensure_remote_path(new_full_path)
             
             # Move the file
-            self.sftp.rename(old_full_path, new_full_path)
-            print(f"🔄 Moved remote: {old_full_path} -> {new_full_path}")
+            self._get_sftp().rename(old_full_path, new_full_path)
+            log.info("🔄 Moved remote: %s -> %s", old_full_path, new_full_path)
             return True
         except Exception as e:
-            print(f"❌ Move failed: {old_remote_path} -> {new_remote_path}: {e}")
+            log.error("❌ Move failed: %s -> %s: %s", old_full_path, new_full_path, e)
             return False
     
+    def delete_files(self, full_remote_paths):
+        """Delete several remote files with pipelined requests on this worker's channel."""
+        sftp = getattr(self._local, 'sftp', None)
+        if len(full_remote_paths) < 2 or sftp is None:
+            for full_remote_path in full_remote_paths:
+                self.delete_file(full_remote_path)
+            return
+        
+        try:
+            errors = self._pipeline(sftp, [(CMD_REMOVE, (sftp._adjust_cwd(path),))
+                                           for path in full_remote_paths])
+        except Exception as e:
+            errors = [e] * len(full_remote_paths)
+        
+        for full_remote_path, error in zip(full_remote_paths, errors):
+            if error is None:
+                log.info("🗑️  Deleted remote: %s", full_remote_path)
+            else:
+                log.error("❌ Delete failed for %s: %s", full_remote_path, error)
+    
+    def move_files(self, pairs):
+        """Move several remote files with pipelined requests on this worker's channel.
+        
+        Renames that touch a path used earlier in the run wait for the requests
+        before them, so chained moves still apply in order.
+        """
+        sftp = getattr(self._local, 'sftp', None)
+        if len(pairs) < 2 or sftp is None:
+            for old_full_path, new_full_path in pairs:
+                self.move_file(old_full_path, new_full_path)
+            return
+        
+        for old_full_path, new_full_path in pairs:
+            self.ensure_remote_path(new_full_path)
+        
+        run, touched = [], set()
+        for pair in pairs + [None]:
+            if pair is not None and touched.isdisjoint(pair):
+                run.append(pair)
+                touched.update(pair)
+                continue
+            
+            try:
+                errors = self._pipeline(sftp, [(CMD_RENAME, (sftp._adjust_cwd(old), sftp._adjust_cwd(new)))
+                                               for old, new in run])
+            except Exception as e:
+                errors = [e] * len(run)
+            
+            for (old_full_path, new_full_path), error in zip(run, errors):
+                if error is None:
+                    log.info("🔄 Moved remote: %s -> %s", old_full_path, new_full_path)
+                else:
+                    log.error("❌ Move failed: %s -> %s: %s", old_full_path, new_full_path, error)
+            
+            run, touched = [pair], set(pair or ())
+    
+    def _changed(self, pairs):
+        """Drop the pairs whose remote file already has the local size and mtime."""
+        local_stats = []
+        
+        def stat_local():
+            local_stats.extend(_local_stat(local_path) for local_path, _ in pairs)
+        
+        sftp = getattr(self._local, 'sftp', None)
+        try:
+            if sftp is not None:
+                # Local stats run while the remote ones are on the wire
+                replies = self._replies(sftp, [(CMD_STAT, (sftp._adjust_cwd(remote),)) for _, remote in pairs],
+                                        meanwhile=stat_local)
+                remote_stats = [SFTPAttributes._from_msg(msg) if t == CMD_ATTRS else None
+                                for t, msg in replies]
+            else:
+                remote_stats = []
+                for _, full_remote_path in pairs:
+                    try:
+                        remote_stats.append(self.sftp.stat(full_remote_path))
+                    except IOError:
+                        remote_stats.append(None)
+        except Exception:
+            return pairs
+        
+        if not local_stats:
+            stat_local()
+        
+        changed = []
+        for pair, local, remote in zip(pairs, local_stats, remote_stats):
+            if (local and remote and remote.st_size == local.st_size
+                    and remote.st_mtime == int(local.st_mtime)):
+                log.info("⏭️  Unchanged, skipped: %s", pair[0])
+            else:
+                changed.append(pair)
+        return changed
+    
+    def _replies(self, sftp, requests, meanwhile=None):
+        """Send (command, args) requests without waiting in between; return each (type, msg) reply.
+        
+        meanwhile, if given, is called once every request has been sent.
+        """
+        collector = _Replies()
+        numbers = [sftp._async_request(collector, t, *args) for t, args in requests]
+        if meanwhile:
+            meanwhile()
+        while len(collector.replies) < len(numbers):
+            sftp._read_response()
+        return [collector.replies[number] for number in numbers]
+    
+    def _pipeline(self, sftp, requests):
+        """Send (command, args) requests without waiting in between; return one error or None each."""
+        errors = []
+        for t, msg in self._replies(sftp, requests):
+            try:
+                if t != CMD_STATUS:
+                    raise IOError(f"Unexpected SFTP response type {t}")
+                sftp._convert_status(msg)
+                errors.append(None)
+            except Exception as e:
+                errors.append(e)
+        return errors
+    
     def start_worker(self):
-        """Start background worker thread for SFTP operations."""
-        if not self.worker_thread or not self.worker_thread.is_alive():
-            self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
-            self.worker_thread.start()
+        """Start background worker threads for SFTP operations."""
+        self.worker_threads = [t for t in self.worker_threads if t.is_alive()]
+        if not self.worker_threads:
+            for index in range(self.channels):
+                thread = threading.Thread(target=self._worker_loop, args=(index,), daemon=True)
+                thread.start()
+                self.worker_threads.append(thread)
+        self._running = True
     
-    def _worker_loop(self):
+    def _worker_loop(self, index):
         """Background worker loop for processing SFTP operations."""
-        while True:
-            try:
-                operation = self.operation_queue.get(timeout=1)
-                if operation is None:  # Shutdown signal
+        operation_queue = self.operation_queues[index]
+        
+        # Open the channel up front so the first burst doesn't pay for it
+        if self.connected:
+            self._open_worker_channel()
+        
+        stop = False
+        while not stop:
+            # Sleep until work arrives; shutdown is signalled through the queue
+            batch = operation_queue.get_batch()
+            if self.debounce and None not in batch:
+                # Let the rest of a save storm arrive so it coalesces with this batch
+                time.sleep(self.debounce)
+                try:
+                    batch.extend(operation_queue.get_batch(block=False))
+                except queue.Empty:
+                    pass
+            stop = None in batch
+            if stop:
+                batch = batch[:batch.index(None)]
+            batch.extend(self._drain_overflow(index))
+            
+            # Hold on to the batch through an outage instead of dropping it. Later
+            # operations stay in the queue and overflow, which keep them bounded
+            backoff = 1
+            while not self._ensure_connection():
+                if stop or not self._running:
+                    log.error("❌ Reconnection failed, dropping %d queued operations", len(batch))
+                    batch = []
                     break
-                
-                op_type, args = operation
-                
-                if not self.connected:
-                    print("⚠️  SFTP not connected, attempting to reconnect...")
-                    if not self.connect():
-                        print("❌ Reconnection failed, skipping operation")
-                        continue
-                
-                if op_type == 'upload':
-                    self.upload_file(*args)
-                elif op_type == 'delete':
-                    self.delete_file(*args)
-                elif op_type == 'move':
-                    self.move_file(*args)
-                
-                self.operation_queue.task_done()
-                
-            except queue.Empty:
-                continue
+                log.error("❌ Reconnection failed, retrying in %ds", backoff)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            
+            try:
+                self._process_batch(self._coalesce(batch))
             except Exception as e:
-                print(f"❌ SFTP worker error: {e}")
+                log.error("❌ SFTP worker error: %s", e)
+        
+        sftp = getattr(self._local, 'sftp', None)
+        if sftp:
+            sftp.close()
+    
+    def _coalesce(self, batch):
+        """Drop uploads and deletes superseded by a later upload or delete of the same path.
+        
+        A move is a barrier for both of its paths, so nothing is dropped across it.
+        """
+        kept = []
+        superseded = set()
+        for op_type, args in reversed(batch):
+            if op_type == 'move':
+                superseded.difference_update(args)
+            else:
+                path = args[1] if op_type == 'upload' else args[0]
+                if path in superseded:
+                    continue
+                superseded.add(path)
+            kept.append((op_type, args))
+        kept.reverse()
+        return kept
+    
+    def _process_batch(self, batch):
+        """Run queued operations in order, sending each run of the same kind in bulk."""
+        for op_type, run in itertools.groupby(batch, key=lambda operation: operation[0]):
+            args = [operation[1] for operation in run]
+            if op_type == 'upload':
+                self.upload_files(args)
+            elif op_type == 'delete':
+                self.delete_files([path for path, in args])
+            elif op_type == 'move':
+                self.move_files(args)
+    
+    def _route(self, op_type, args):
+        """Pick a worker so operations on the same remote path stay in order."""
+        if self.channels == 1:
+            return 0
+        
+        key = args[1] if op_type == 'upload' else args[0]
+        index = self._routes.get(key, hash(key) % self.channels)
+        
+        if op_type == 'move':
+            # Later operations on the destination must queue behind the rename
+            if len(self._routes) > 10000:
+                self._routes.clear()
+            self._routes[args[1]] = index
+        return index
+    
+    @property
+    def accepting(self):
+        """True while operations can be queued, including while workers ride out a reconnect."""
+        return self.connected or self._running
     
     def queue_operation(self, op_type, *args):
         """Queue an SFTP operation for background processing."""
-        if self.connected:
-            self.operation_queue.put((op_type, args))
+        if self.accepting:
+            index = self._route(op_type, args)
+            operation_queue = self.operation_queues[index]
+            if self._overflow[index] or operation_queue.qsize() >= self.max_queued:
+                if self._coalesce_overflow(index, op_type, args):
+                    return
+            operation_queue.put((op_type, args))
+    
+    def _coalesce_overflow(self, index, op_type, args):
+        """Hold an operation in the worker's overflow; False if the overflow drained meanwhile."""
+        with self._overflow_lock:
+            overflow = self._overflow[index]
+            if not overflow and self.operation_queues[index].qsize() < self.max_queued:
+                return False
+            
+            paths = self._overflow_paths[index]
+            seq = next(self._overflow_seq)
+            if op_type == 'move':
+                # Nothing before the rename may be superseded by what follows it
+                for path in args:
+                    paths.pop(path, None)
+            else:
+                path = args[1] if op_type == 'upload' else args[0]
+                superseded = paths.pop(path, None)
+                if superseded is not None:
+                    del overflow[superseded]
+                paths[path] = seq
+            
+            overflow[seq] = (op_type, args)
+            return True
+    
+    def _drain_overflow(self, index):
+        """Take the operations held in overflow for a worker, oldest first."""
+        if not self._overflow[index]:
+            return []
+        with self._overflow_lock:
+            overflow, self._overflow[index] = self._overflow[index], {}
+            self._overflow_paths[index] = {}
+        return list(overflow.values())
     
     def stop_worker(self):
-        """Stop the background worker thread."""
-        if self.worker_thread and self.worker_thread.is_alive():
-            self.operation_queue.put(None)  # Shutdown signal
-            self.worker_thread.join(timeout=5)
+        """Stop the background worker threads."""
+        alive = [t for t in self.worker_threads if t.is_alive()]
+        self._running = False
+        for operation_queue in self.operation_queues:
+            operation_queue.put(None)  # Shutdown signal
+        for thread in alive:
+            thread.join(timeout=5)